@@ -3,11 +3,22 @@ Flask demo app - CRUD operations with Azure SQL Database.
 Displays hostname and allows adding/deleting messages.
 Fetches external time via NAT Gateway to demonstrate outbound connectivity.
 """
+import csv
+import datetime
+import hashlib
+import io
+import json
 import os
+import random
+import re
 import socket
+import threading
+import time
 import pyodbc
 import requests
-from flask import Flask, request, redirect, url_for, session
+from flask import (
+    Flask, Response, g, has_request_context, request, redirect, stream_with_context, url_for, session
+)
 
 app = Flask(__name__)
 app.secret_key = 'demo-app-fixed-secret-key-for-load-balancer'
@@ -20,20 +31,502 @@ SQL_PASSWORD = os.environ.get('SQL_PASSWORD', '')
 BLOB_STORAGE_URL = os.environ.get('BLOB_STORAGE_URL', '')
 BLOB_STORAGE_ACCOUNT = os.environ.get('BLOB_STORAGE_ACCOUNT', '')
 
+# Optional read routing: read-only queries go to a replica. Set
+# SQL_READ_SERVER/SQL_READ_DATABASE for a geo-replica, or SQL_READ_INTENT=1
+# to use the primary's built-in read-only replica (ApplicationIntent=ReadOnly).
+SQL_READ_SERVER = os.environ.get('SQL_READ_SERVER', '') or SQL_SERVER
+SQL_READ_DATABASE = os.environ.get('SQL_READ_DATABASE', '') or SQL_DATABASE
+READ_ROUTING = (
+    os.environ.get('SQL_READ_INTENT', '') == '1'
+    or (SQL_READ_SERVER, SQL_READ_DATABASE) != (SQL_SERVER, SQL_DATABASE)
+)
+# After a write, the session reads from the primary, bypassing cached data, for
+# this long (read-your-writes)
+READ_AFTER_WRITE_PIN_SECONDS = float(os.environ.get('READ_AFTER_WRITE_PIN_SECONDS', '5'))
+# After a replica failure, reads go to the primary for this long
+REPLICA_RETRY_SECONDS = float(os.environ.get('REPLICA_RETRY_SECONDS', '30'))
+
 HOSTNAME = socket.gethostname()
 
-def get_connection():
-    """Get a connection to the SQL database."""
+# Background probe tuning (seconds). The NAT and DB status shown on the page
+# comes from these probes, so page views never wait on outbound HTTP.
+NAT_PROBE_INTERVAL = float(os.environ.get('NAT_PROBE_INTERVAL', '60'))
+DB_PROBE_INTERVAL = float(os.environ.get('DB_PROBE_INTERVAL', '15'))
+PROBE_JITTER = float(os.environ.get('PROBE_JITTER', '0.2'))  # +/- fraction of interval
+PROBE_FAILURE_THRESHOLD = int(os.environ.get('PROBE_FAILURE_THRESHOLD', '3'))
+PROBE_BREAKER_COOLDOWN = float(os.environ.get('PROBE_BREAKER_COOLDOWN', '300'))
+
+# Message cache: max seconds another VM's writes may take to show up here
+# (0 disables the cache), and how often to fully reload when change
+# tracking is unavailable and deletes can't be detected incrementally.
+MESSAGE_CACHE_TTL = float(os.environ.get('MESSAGE_CACHE_TTL', '2'))
+MESSAGE_CACHE_FULL_RELOAD = float(os.environ.get('MESSAGE_CACHE_FULL_RELOAD', '300'))
+
+# How long the table version behind the index page's ETag is reused
+ETAG_VERSION_TTL = float(os.environ.get('ETAG_VERSION_TTL', '1'))
+
+# Group commit for /add: buffer concurrent inserts for up to this many ms
+# (0 disables) or rows, then commit them as one multi-row INSERT. SQL Server
+# allows at most 1000 rows per VALUES list.
+WRITE_BATCH_WINDOW_MS = float(os.environ.get('WRITE_BATCH_WINDOW_MS', '0'))
+WRITE_BATCH_MAX_ROWS = min(max(int(os.environ.get('WRITE_BATCH_MAX_ROWS', '50')), 1), 1000)
+
+# Statements slower than this are logged (with parameters redacted)
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '500'))
+
+# Retention: purge messages older than this many days (0 keeps them forever),
+# deleting RETENTION_BATCH_ROWS at a time with a pause between batches so
+# locks stay short. Only one VM purges at a time (sp_getapplock).
+MESSAGE_RETENTION_DAYS = float(os.environ.get('MESSAGE_RETENTION_DAYS', '0'))
+RETENTION_INTERVAL = float(os.environ.get('RETENTION_INTERVAL', '3600'))
+RETENTION_BATCH_ROWS = int(os.environ.get('RETENTION_BATCH_ROWS', '500'))
+RETENTION_PAUSE_MS = float(os.environ.get('RETENTION_PAUSE_MS', '200'))
+
+# Transient fault handling (Azure SQL failover, auto-resume, login throttling).
+# Retries back off exponentially with full jitter and share one latency
+# budget per request; after SQL_BREAKER_THRESHOLD consecutive units of work
+# have run out of retries on transient errors, the circuit opens and
+# requests fail fast for SQL_BREAKER_COOLDOWN.
+SQL_RETRY_BUDGET_MS = float(os.environ.get('SQL_RETRY_BUDGET_MS', '3000'))
+SQL_RETRY_BASE_MS = float(os.environ.get('SQL_RETRY_BASE_MS', '100'))
+SQL_RETRY_MAX_ATTEMPTS = int(os.environ.get('SQL_RETRY_MAX_ATTEMPTS', '5'))
+SQL_BREAKER_THRESHOLD = int(os.environ.get('SQL_BREAKER_THRESHOLD', '5'))
+SQL_BREAKER_COOLDOWN = float(os.environ.get('SQL_BREAKER_COOLDOWN', '30'))
+
+# Rows fetched per round trip when streaming /export
+EXPORT_BATCH_ROWS = int(os.environ.get('EXPORT_BATCH_ROWS', '500'))
+
+# Each gunicorn worker has its own metrics. With METRICS_DIR set, workers
+# save theirs there every METRICS_FLUSH_INTERVAL seconds and /metrics serves
+# the sum over all workers, so a scrape doesn't depend on which one answers.
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', '5'))
+
+class Histogram:
+    """Cumulative histogram rendered in the Prometheus text format."""
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.series = {}  # label tuple -> [per-bucket counts..., sum, count]
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.series.setdefault(key, [0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {key: list(series) for key, series in self.series.items()}
+
+    def render(self, all_series=None):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for key, series in sorted((self.snapshot() if all_series is None else all_series).items()):
+            labels = ''.join(f'{k}="{escape_label(v)}",' for k, v in key)
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{{labels}le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{labels}le="+Inf"}} {series[-1]}')
+            suffix = f'{{{labels[:-1]}}}' if labels else ''
+            lines.append(f'{self.name}_sum{suffix} {series[-2]}')
+            lines.append(f'{self.name}_count{suffix} {series[-1]}')
+        return '\n'.join(lines)
+
+class Counter:
+    """Monotonic counter rendered in the Prometheus text format."""
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self.lock = threading.Lock()
+        self.series = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.series[key] = self.series.get(key, 0) + amount
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.series)
+
+    def render(self, all_series=None):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        for key, value in sorted((self.snapshot() if all_series is None else all_series).items()):
+            labels = ','.join(f'{k}="{escape_label(v)}"' for k, v in key)
+            lines.append(f'{self.name}{{{labels}}} {value}' if labels else f'{self.name} {value}')
+        return '\n'.join(lines)
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+WRITE_BATCH_SIZE = Histogram(
+    'demo_write_batch_rows', 'Rows committed per group-commit batch',
+    [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000]
+)
+
+LATENCY_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+SQL_CONNECT_SECONDS = Histogram('demo_sql_connect_seconds', 'Time to open a SQL connection', LATENCY_BUCKETS)
+SQL_EXECUTE_SECONDS = Histogram('demo_sql_execute_seconds', 'Statement execution time', LATENCY_BUCKETS)
+SQL_FETCH_SECONDS = Histogram('demo_sql_fetch_seconds', 'Time spent fetching result rows', LATENCY_BUCKETS)
+SQL_ROWS = Counter('demo_sql_rows_fetched_total', 'Result rows fetched')
+RETENTION_PURGED = Counter('demo_retention_purged_rows_total', 'Messages deleted by the retention purge')
+SQL_RETRIES = Counter('demo_sql_retries_total', 'Retried transient SQL errors by error code')
+SQL_RETRY_ADDED_SECONDS = Histogram(
+    'demo_sql_retry_added_seconds', 'Latency added by retries (failed attempts plus backoff) per unit of work',
+    LATENCY_BUCKETS
+)
+SQL_BREAKER_OPENED = Counter('demo_sql_breaker_opened_total', 'Times the SQL circuit breaker opened')
+SQL_BREAKER_REJECTED = Counter('demo_sql_breaker_rejected_total', 'Database calls rejected by the open breaker')
+SQL_READS = Counter('demo_sql_reads_total', 'Read units of work by target (primary, replica, replica_failed)')
+HTTP_REQUEST_SECONDS = Histogram('demo_http_request_seconds', 'Total request handling time', LATENCY_BUCKETS)
+HTTP_SQL_SECONDS = Histogram(
+    'demo_http_request_sql_seconds', 'SQL connect, execute and fetch time within a request', LATENCY_BUCKETS
+)
+
+METRICS = [
+    WRITE_BATCH_SIZE, SQL_CONNECT_SECONDS, SQL_EXECUTE_SECONDS, SQL_FETCH_SECONDS, SQL_ROWS, SQL_READS,
+    RETENTION_PURGED, SQL_RETRIES, SQL_RETRY_ADDED_SECONDS, SQL_BREAKER_OPENED, SQL_BREAKER_REJECTED,
+    HTTP_REQUEST_SECONDS, HTTP_SQL_SECONDS,
+]
+
+def save_worker_metrics():
+    """Write this worker's series to METRICS_DIR/<pid>.json."""
+    data = {
+        metric.name: [[key, value] for key, value in metric.snapshot().items()]
+        for metric in METRICS
+    }
+    path = os.path.join(METRICS_DIR, f'{os.getpid()}.json')
+    with open(path + '.tmp', 'w') as f:
+        json.dump(data, f)
+    os.replace(path + '.tmp', path)
+
+def save_worker_metrics_loop():
+    while True:
+        time.sleep(METRICS_FLUSH_INTERVAL)
+        try:
+            save_worker_metrics()
+        except OSError as e:
+            print(f"Saving metrics to {METRICS_DIR} failed: {e}")
+
+def collect_metrics():
+    """Return {metric name: series}, summed over every worker when METRICS_DIR is set.
+
+    Files of exited workers are kept so counters never go backwards;
+    start.sh empties the directory when the service starts.
+    """
+    if not METRICS_DIR:
+        return {metric.name: metric.snapshot() for metric in METRICS}
+    save_worker_metrics()
+    totals = {metric.name: {} for metric in METRICS}
+    for filename in os.listdir(METRICS_DIR):
+        if not filename.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(METRICS_DIR, filename)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue  # replaced or removed while we read it
+        for name, entries in data.items():
+            series = totals.get(name)
+            if series is None:
+                continue
+            for key, value in entries:
+                key = tuple(tuple(label) for label in key)
+                if isinstance(value, list):
+                    series[key] = [a + b for a, b in zip(series.get(key, [0] * len(value)), value)]
+                else:
+                    series[key] = series.get(key, 0) + value
+    return totals
+
+def normalize_statement(sql):
+    """Reduce a statement to a low-cardinality label: literals become ?."""
+    sql = re.sub(r"N?'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'\b\d+\b', '?', sql)
+    sql = ' '.join(sql.split())
+    sql = re.sub(r'\(\?, \?\)(?:, \(\?, \?\))+', '(?, ?), ...', sql)
+    return sql[:120]
+
+def record_sql_time(seconds):
+    """Attribute SQL time to the current request, if there is one."""
+    if has_request_context():
+        g.sql_seconds = g.get('sql_seconds', 0.0) + seconds
+
+class InstrumentedCursor:
+    """Cursor wrapper recording execute/fetch timings per normalized statement."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._statement = None
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def execute(self, sql, params=()):
+        self._statement = normalize_statement(sql)
+        start = time.perf_counter()
+        try:
+            if params:
+                self._cursor.execute(sql, params)
+            else:
+                self._cursor.execute(sql)
+            # Return the wrapper, as pyodbc does, so chained fetches stay instrumented
+            return self
+        finally:
+            elapsed = time.perf_counter() - start
+            SQL_EXECUTE_SECONDS.observe(elapsed, statement=self._statement)
+            record_sql_time(elapsed)
+            if elapsed * 1000 >= SLOW_QUERY_MS:
+                redacted = ', '.join(f'<{type(p).__name__}>' for p in params)
+                print(f"Slow query ({elapsed * 1000:.0f} ms): {self._statement} params=[{redacted}]")
+
+    def _fetch(self, method, *args):
+        start = time.perf_counter()
+        result = getattr(self._cursor, method)(*args)
+        elapsed = time.perf_counter() - start
+        SQL_FETCH_SECONDS.observe(elapsed, statement=self._statement)
+        record_sql_time(elapsed)
+        rows = (1 if result is not None else 0) if method == 'fetchone' else len(result)
+        SQL_ROWS.inc(rows, statement=self._statement)
+        return result
+
+    def fetchone(self):
+        return self._fetch('fetchone')
+
+    def fetchall(self):
+        return self._fetch('fetchall')
+
+    def fetchmany(self, size):
+        return self._fetch('fetchmany', size)
+
+class InstrumentedConnection:
+    """Connection wrapper whose cursors are instrumented."""
+
+    def __init__(self, conn):
+        object.__setattr__(self, '_conn', conn)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._conn, name, value)
+
+    def cursor(self):
+        return InstrumentedCursor(self._conn.cursor())
+
+def get_connection(readonly=False):
+    """Get a connection to the primary SQL database, or to the read replica.
+
+    With unixODBC pooling enabled (vm-setup.sh turns it on) connections are
+    pooled per connection string, so the replica gets its own pool.
+    """
     conn_str = (
         f"Driver={{ODBC Driver 18 for SQL Server}};"
-        f"Server={SQL_SERVER};"
-        f"Database={SQL_DATABASE};"
+        f"Server={SQL_READ_SERVER if readonly else SQL_SERVER};"
+        f"Database={SQL_READ_DATABASE if readonly else SQL_DATABASE};"
         f"Uid={SQL_USER};"
         f"Pwd={SQL_PASSWORD};"
         f"Encrypt=yes;"
         f"TrustServerCertificate=no;"
+        f"{'ApplicationIntent=ReadOnly;' if readonly else ''}"
     )
-    return pyodbc.connect(conn_str)
+    start = time.perf_counter()
+    try:
+        return InstrumentedConnection(pyodbc.connect(conn_str))
+    finally:
+        elapsed = time.perf_counter() - start
+        SQL_CONNECT_SECONDS.observe(elapsed, target='replica' if readonly else 'primary')
+        record_sql_time(elapsed)
+
+# Azure SQL error numbers that are worth retrying
+# (https://learn.microsoft.com/azure/azure-sql/database/troubleshoot-common-errors-issues)
+TRANSIENT_SQL_ERRORS = {
+    20, 64, 121, 233, 1205, 4060, 4221, 10053, 10054, 10060, 10928, 10929,
+    40143, 40166, 40197, 40501, 40540, 40545, 40613, 49918, 49919, 49920,
+}
+TRANSIENT_SQLSTATES = {'08S01', '08001', 'HYT00', '40001'}
+
+class DatabaseUnavailable(Exception):
+    """Raised without touching the database while the circuit breaker is open."""
+
+def error_codes(e):
+    """SQL Server error numbers in a pyodbc error message, e.g. '... (40613)'."""
+    return {int(code) for code in re.findall(r'\((\d+)\)', ' '.join(str(a) for a in e.args))}
+
+def is_transient(e):
+    if not isinstance(e, pyodbc.Error):
+        return False
+    sqlstate = e.args[0] if e.args else ''
+    return sqlstate in TRANSIENT_SQLSTATES or bool(error_codes(e) & TRANSIENT_SQL_ERRORS)
+
+class CircuitBreaker:
+    """Fails fast during sustained outages instead of piling up retries.
+
+    It counts units of work (with_retry calls) that gave up on a transient
+    error, not attempts, so one request exhausting its retries or a brief
+    blip absorbed by retries doesn't open it. Once the cooldown has passed the breaker is half-open: a single caller
+    gets a trial call while the rest keep failing fast. The trial succeeding
+    closes the breaker; a transient failure reopens it.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.open_until = 0.0
+        self.trial_running = False
+
+    def check(self):
+        with self.lock:
+            if self.failures < SQL_BREAKER_THRESHOLD:
+                return
+            remaining = self.open_until - time.time()
+            if remaining <= 0 and not self.trial_running:
+                self.trial_running = True
+                return
+        SQL_BREAKER_REJECTED.inc()
+        if remaining > 0:
+            raise DatabaseUnavailable(f"database circuit open, retrying in {remaining:.0f}s")
+        raise DatabaseUnavailable("database circuit open, trial call in progress")
+
+    def record(self, transient_failure):
+        with self.lock:
+            self.trial_running = False
+            if not transient_failure:
+                self.failures = 0
+                return
+            self.failures += 1
+            if self.failures >= SQL_BREAKER_THRESHOLD:
+                if self.open_until <= time.time():
+                    print(f"SQL circuit breaker open for {SQL_BREAKER_COOLDOWN:.0f}s "
+                          f"after {self.failures} failed calls")
+                    SQL_BREAKER_OPENED.inc()
+                self.open_until = time.time() + SQL_BREAKER_COOLDOWN
+
+SQL_BREAKER = CircuitBreaker()
+
+def retry_deadline():
+    """Deadline for retries, shared by every database call in a request."""
+    if not has_request_context():
+        return time.monotonic() + SQL_RETRY_BUDGET_MS / 1000
+    if 'retry_deadline' not in g:
+        g.retry_deadline = time.monotonic() + SQL_RETRY_BUDGET_MS / 1000
+    return g.retry_deadline
+
+def with_retry(work, can_retry=lambda: True):
+    """Call work(), retrying transient SQL errors with jittered exponential backoff.
+
+    The circuit breaker is checked once per call and told its final outcome.
+    """
+    deadline = retry_deadline()
+    started = time.monotonic()
+    attempt = 0
+    SQL_BREAKER.check()
+    while True:
+        attempt_started = time.monotonic()
+        try:
+            result = work()
+        except Exception as e:
+            transient = is_transient(e)
+            delay = random.uniform(0, SQL_RETRY_BASE_MS / 1000 * 2 ** attempt)
+            attempt += 1
+            if (not transient or not can_retry() or attempt >= SQL_RETRY_MAX_ATTEMPTS
+                    or time.monotonic() + delay > deadline):
+                SQL_BREAKER.record(transient)
+                if attempt > 1:
+                    SQL_RETRY_ADDED_SECONDS.observe(attempt_started - started, outcome='failed')
+                raise
+            SQL_RETRIES.inc(code=min(error_codes(e) & TRANSIENT_SQL_ERRORS, default=e.args[0]))
+            time.sleep(delay)
+            continue
+        SQL_BREAKER.record(False)
+        if attempt:
+            SQL_RETRY_ADDED_SECONDS.observe(attempt_started - started, outcome='recovered')
+        return result
+
+def run_write(work):
+    """Run work(cursor) on the primary and commit, returning its result.
+
+    Transient failures are retried only if the commit was never attempted,
+    so a write whose outcome is unknown is not applied twice. Errors raised
+    by the commit itself are marked with commit_attempted = True.
+    """
+    committing = [False]
+
+    def attempt():
+        committing[0] = False
+        conn = get_connection()
+        try:
+            result = work(conn.cursor())
+            committing[0] = True
+            try:
+                conn.commit()
+            except Exception as e:
+                e.commit_attempted = True
+                raise
+            return result
+        finally:
+            conn.close()
+    return with_retry(attempt, can_retry=lambda: not committing[0])
+
+def describe_db_error(e):
+    """User-facing text for a database error."""
+    if isinstance(e, DatabaseUnavailable) or is_transient(e):
+        return f"Temporarily unavailable (failover, resume or throttling), please retry shortly: {e}"
+    return f"Error: {e}"
+
+_replica_down_until = 0.0
+
+def pin_to_primary():
+    """Send this session's reads to the primary for a while after it writes.
+
+    Pinned sessions also bypass the per-VM message cache and table version,
+    so they see their own writes whichever VM serves the next request.
+    """
+    session['primary_until'] = time.time() + READ_AFTER_WRITE_PIN_SECONDS
+
+def pinned_to_primary():
+    return has_request_context() and session.get('primary_until', 0) > time.time()
+
+def run_read(work, keep_open=False):
+    """Run work(conn) on the read replica when allowed, else on the primary.
+
+    If the replica fails, the read is retried on the primary and the replica
+    is skipped for REPLICA_RETRY_SECONDS. Transient errors on the primary are
+    retried. With keep_open the caller gets (conn, result) and must close
+    conn itself.
+    """
+    global _replica_down_until
+
+    def attempt(readonly):
+        conn = get_connection(readonly=readonly)
+        try:
+            result = work(conn)
+        except Exception:
+            conn.close()
+            raise
+        SQL_READS.inc(target='replica' if readonly else 'primary')
+        if keep_open:
+            return conn, result
+        conn.close()
+        return result
+
+    if READ_ROUTING and time.time() >= _replica_down_until and not pinned_to_primary():
+        try:
+            return attempt(True)
+        except Exception as e:
+            print(f"Read replica failed, using primary for {REPLICA_RETRY_SECONDS:.0f}s: {e}")
+            _replica_down_until = time.time() + REPLICA_RETRY_SECONDS
+            SQL_READS.inc(target='replica_failed')
+    return with_retry(lambda: attempt(False))
 
 def init_db():
     """Create the messages table if it doesn't exist."""
@@ -46,16 +539,42 @@ def init_db():
                 id INT IDENTITY(1,1) PRIMARY KEY,
                 message NVARCHAR(500) NOT NULL,
                 hostname NVARCHAR(100) NOT NULL,
-                created_at DATETIME DEFAULT GETDATE()
+                created_at DATETIME DEFAULT GETDATE(),
+                rv ROWVERSION
             )
         """)
+        # Tables created by older versions of the app lack the rowversion column
+        cursor.execute("IF COL_LENGTH('messages', 'rv') IS NULL ALTER TABLE messages ADD rv ROWVERSION")
+        # Supports both the newest-first listing and the retention purge
+        cursor.execute("""
+            IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_messages_created_at')
+            CREATE INDEX IX_messages_created_at ON messages (created_at)
+        """)
         conn.commit()
+        try:
+            enable_change_tracking(conn)
+        except Exception as e:
+            print(f"Change tracking unavailable, deletes need full reloads: {e}")
         conn.close()
         return True
     except Exception as e:
         print(f"DB init error: {e}")
         return False
 
+def enable_change_tracking(conn):
+    """Turn on change tracking so message caches can see deletes."""
+    # ALTER DATABASE can't run inside the implicit transaction
+    conn.autocommit = True
+    cursor = conn.cursor()
+    cursor.execute("""
+        IF NOT EXISTS (SELECT * FROM sys.change_tracking_databases WHERE database_id = DB_ID())
+        ALTER DATABASE CURRENT SET CHANGE_TRACKING = ON (CHANGE_RETENTION = 2 DAYS, AUTO_CLEANUP = ON)
+    """)
+    cursor.execute("""
+        IF NOT EXISTS (SELECT * FROM sys.change_tracking_tables WHERE object_id = OBJECT_ID('messages'))
+        ALTER TABLE messages ENABLE CHANGE_TRACKING
+    """)
+
 def init_blob_access():
     """Setup external data source for reading from blob storage."""
     if not BLOB_STORAGE_ACCOUNT:
@@ -131,28 +650,457 @@ def get_outbound_ip():
         return {'status': f'Error: {e}', 'ip': 'N/A'}
     return {'status': 'Failed', 'ip': 'N/A'}
 
+_db_initialized = False
+
+SELECT_MESSAGES = "SELECT id, message, hostname, created_at, CAST(rv AS BIGINT) FROM messages"
+
+class MessageCache:
+    """Per-process copy of the messages table, refreshed incrementally.
+
+    New rows are found via the rowversion column (up to the oldest
+    uncommitted rowversion) and deletes via change tracking, so a refresh
+    only transfers what changed since the last one. Writes from this process
+    invalidate immediately; writes from other VMs show up within
+    MESSAGE_CACHE_TTL seconds.
+
+    One request refreshes at a time, outside the lock that guards the rows;
+    requests that queued behind it reuse its result. If a refresh fails, the
+    last rows are served for another MESSAGE_CACHE_TTL before trying again.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()  # guards the cached rows
+        self.refresh_lock = threading.Lock()  # held for the database round trip
+        self.rows = {}
+        self.rvs = {}  # id -> rowversion of the cached row
+        self.max_rv = None  # None until the first full load
+        self.ct_version = None
+        self.refreshed_at = 0.0
+        self.full_loaded_at = 0.0
+        self.dirty = True
+        self.attempt_started_at = 0.0  # start of the last refresh, successful or not
+        self.attempt_pinned = False
+        self.error = None  # exception of the last refresh if it failed
+        self.failed_at = 0.0
+
+    def invalidate(self, deleted_ids=()):
+        """Force a refresh on the next read, dropping deleted rows right away."""
+        with self.lock:
+            self.dirty = True
+            for msg_id in deleted_ids:
+                self.rows.pop(msg_id, None)
+                self.rvs.pop(msg_id, None)
+
+    def get_messages(self):
+        """Return (messages newest first, table version), refreshing if stale.
+
+        Sessions pinned to the primary after a write always refresh (from the
+        primary), so they see their own writes even if a lagging replica
+        served the last refresh.
+        """
+        requested_at = time.time()
+        pinned = pinned_to_primary()
+        if pinned or self.is_stale(requested_at):
+            with self.refresh_lock:
+                # A refresh that started after this request arrived is as good as our own
+                reuse = self.attempt_started_at >= requested_at and (self.attempt_pinned or not pinned)
+                if not reuse and (pinned or self.is_stale(time.time())):
+                    self.refresh(pinned)
+                if self.error is not None and self.max_rv is None:
+                    raise self.error  # nothing cached to fall back on
+        with self.lock:
+            messages = sorted(self.rows.values(), key=lambda r: (r[3], r[0]), reverse=True)
+            return messages, (len(self.rvs), max(self.rvs.values(), default=None))
+
+    def is_stale(self, now):
+        if self.dirty or self.max_rv is None:
+            return True
+        last = self.failed_at if self.error is not None else self.refreshed_at
+        return now - last >= MESSAGE_CACHE_TTL
+
+    def refresh(self, pinned):
+        """Fetch changes from the database; call with refresh_lock held."""
+        with self.lock:
+            started = time.time()
+            self.attempt_started_at = started
+            self.attempt_pinned = pinned
+            self.dirty = False  # an invalidate during the fetch sets it again
+        try:
+            full, fetched, deleted, ct_version, seen_rv = run_read(
+                lambda conn: self.fetch_changes(conn, started)
+            )
+        except Exception as e:
+            print(f"Message cache refresh failed: {describe_db_error(e)}")
+            with self.lock:
+                self.error = e
+                self.failed_at = time.time()
+            return
+        with self.lock:
+            if full:
+                self.rows = {}
+                self.rvs = {}
+                self.max_rv = 0
+                self.full_loaded_at = started
+            self.max_rv = max(self.max_rv, seen_rv)
+            for msg_id in deleted:
+                self.rows.pop(msg_id, None)
+                self.rvs.pop(msg_id, None)
+            for row in fetched:
+                self.rows[row[0]] = tuple(row[:4])
+                self.rvs[row[0]] = row[4]
+            self.ct_version = ct_version
+            self.error = None
+            self.refreshed_at = time.time()
+
+    def fetch_changes(self, conn, now):
+        """Return (full reload?, upserted rows, deleted ids, change tracking version,
+        highest rowversion below which every row has been read).
+        """
+        cursor = conn.cursor()
+        # Read the versions first so changes racing this refresh are seen again next time.
+        # Rowversions are assigned at write time, not commit time, so a row below
+        # the max committed rowversion may still be in flight; only rows below
+        # MIN_ACTIVE_ROWVERSION() are known to be complete.
+        cursor.execute("SELECT CHANGE_TRACKING_CURRENT_VERSION(), CAST(MIN_ACTIVE_ROWVERSION() AS BIGINT)")
+        ct_version, min_active_rv = cursor.fetchone()  # ct_version is NULL when change tracking is off
+        if self.max_rv is None or not self.can_track_deletes(cursor, ct_version, now):
+            cursor.execute(SELECT_MESSAGES)
+            return True, cursor.fetchall(), [], ct_version, min_active_rv - 1
+        cursor.execute(
+            SELECT_MESSAGES + " WHERE rv > CAST(? AS BINARY(8)) AND rv < MIN_ACTIVE_ROWVERSION()",
+            (self.max_rv,)
+        )
+        fetched = cursor.fetchall()
+        deleted = []
+        if ct_version is not None:
+            cursor.execute(
+                "SELECT ct.id FROM CHANGETABLE(CHANGES messages, ?) AS ct "
+                "WHERE ct.SYS_CHANGE_OPERATION = 'D'",
+                (self.ct_version,)
+            )
+            deleted = [row[0] for row in cursor.fetchall()]
+        return False, fetched, deleted, ct_version, min_active_rv - 1
+
+    def can_track_deletes(self, cursor, ct_version, now):
+        """Whether deletes since the last refresh can be found incrementally."""
+        if ct_version is None or self.ct_version is None:
+            return now - self.full_loaded_at < MESSAGE_CACHE_FULL_RELOAD
+        # Change tracking cleanup may have discarded versions we haven't seen
+        cursor.execute("SELECT CHANGE_TRACKING_MIN_VALID_VERSION(OBJECT_ID('messages'))")
+        return cursor.fetchone()[0] <= self.ct_version
+
+MESSAGE_CACHE = MessageCache()
+
+def list_messages():
+    """Return ((id, message, hostname, created_at) rows newest first, table version).
+
+    The version is (row count, max rowversion) of exactly the rows returned,
+    matching what get_table_version() reports for the same table state.
+    """
+    if MESSAGE_CACHE_TTL > 0:
+        return MESSAGE_CACHE.get_messages()
+
+    def query(conn):
+        cursor = conn.cursor()
+        cursor.execute(SELECT_MESSAGES + " ORDER BY created_at DESC")
+        return cursor.fetchall()
+    rows = run_read(query)
+    return [tuple(row[:4]) for row in rows], (len(rows), max((row[4] for row in rows), default=None))
+
+_table_version = (None, 0.0)
+_table_version_lock = threading.Lock()
+
+def get_table_version():
+    """Return (row count, max rowversion) of messages, reused for ETAG_VERSION_TTL.
+
+    Every insert or update raises the max rowversion and every delete lowers
+    the count, so the pair changes whenever the table does. Sessions pinned
+    to the primary after a write always look it up fresh.
+    """
+    global _table_version
+    with _table_version_lock:
+        version, fetched_at = _table_version
+        if version is not None and time.time() - fetched_at < ETAG_VERSION_TTL and not pinned_to_primary():
+            return version
+
+    def query(conn):
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT_BIG(*), CAST(MAX(rv) AS BIGINT) FROM messages")
+        return tuple(cursor.fetchone())
+    version = run_read(query)
+    with _table_version_lock:
+        _table_version = (version, time.time())
+    return version
+
+def page_etag(version, db_probe, outbound_ip):
+    """ETag for the index page given the table version and probe results.
+
+    Weak, because the probe ages shown on the page are left out on purpose.
+    """
+    key = repr((version, HOSTNAME, db_probe, outbound_ip))
+    return hashlib.sha1(key.encode()).hexdigest()[:20]
+
+class WriteBatcher:
+    """Coalesces concurrent inserts into one multi-row INSERT per transaction.
+
+    Callers block until their row's batch commits. If a batch fails before
+    its commit, its rows are retried one by one so each caller gets its own
+    success or failure. If the commit itself failed the batch may have been
+    stored, so every caller gets the error instead of a duplicate insert.
+    """
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.pending = []
+
+    def insert(self, message, hostname):
+        item = {'row': (message, hostname), 'done': threading.Event(), 'error': None}
+        with self.cond:
+            self.pending.append(item)
+            self.cond.notify()
+        item['done'].wait()
+        if item['error'] is not None:
+            raise item['error']
+
+    def loop(self):
+        while True:
+            with self.cond:
+                while not self.pending:
+                    self.cond.wait()
+                deadline = time.monotonic() + WRITE_BATCH_WINDOW_MS / 1000
+                while len(self.pending) < WRITE_BATCH_MAX_ROWS:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.cond.wait(remaining)
+                batch = self.pending[:WRITE_BATCH_MAX_ROWS]
+                self.pending = self.pending[WRITE_BATCH_MAX_ROWS:]
+            self.flush(batch)
+
+    def flush(self, batch):
+        try:
+            insert_messages([item['row'] for item in batch])
+            WRITE_BATCH_SIZE.observe(len(batch))
+        except Exception as e:
+            if len(batch) == 1 or getattr(e, 'commit_attempted', False):
+                for item in batch:
+                    item['error'] = e
+            else:
+                for item in batch:
+                    self.flush([item])
+        for item in batch:
+            item['done'].set()
+
+WRITE_BATCHER = WriteBatcher()
+
+def insert_messages(rows):
+    """Insert (message, hostname) rows in a single transaction."""
+    values = ', '.join(['(?, ?)'] * len(rows))
+    run_write(lambda cursor: cursor.execute(
+        f"INSERT INTO messages (message, hostname) VALUES {values}",
+        [value for row in rows for value in row]
+    ))
+
+def probe_database():
+    """Check DB connectivity, creating the messages table on first success."""
+    global _db_initialized
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
+        conn.close()
+    except Exception as e:
+        return {'status': f'Error: {e}'}
+    if not _db_initialized:
+        _db_initialized = init_db()
+    return {'status': 'OK'}
+
+class Probe:
+    """Periodically runs a check in the background and caches its last result.
+
+    After PROBE_FAILURE_THRESHOLD consecutive failures the circuit opens and
+    the check is only retried every PROBE_BREAKER_COOLDOWN seconds.
+    """
+
+    def __init__(self, name, check, interval):
+        self.name = name
+        self.check = check
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.result = None
+        self.checked_at = None
+        self.failures = 0
+
+    @property
+    def circuit_open(self):
+        return self.failures >= PROBE_FAILURE_THRESHOLD
+
+    def run_once(self):
+        try:
+            result = self.check()
+        except Exception as e:
+            result = {'status': f'Error: {e}'}
+        with self.lock:
+            self.result = result
+            self.checked_at = time.time()
+            self.failures = 0 if result.get('status') == 'OK' else self.failures + 1
+
+    def next_delay(self):
+        delay = PROBE_BREAKER_COOLDOWN if self.circuit_open else self.interval
+        return max(1.0, delay * (1 + random.uniform(-PROBE_JITTER, PROBE_JITTER)))
+
+    def loop(self):
+        while True:
+            self.run_once()
+            time.sleep(self.next_delay())
+
+    def snapshot(self):
+        """Return (result, age in seconds) without doing any I/O."""
+        with self.lock:
+            if self.result is None:
+                return {'status': 'Pending first check'}, None
+            result = dict(self.result)
+            if self.circuit_open:
+                result['status'] += f' (circuit open after {self.failures} failures)'
+            return result, time.time() - self.checked_at
+
+def purge_expired_messages():
+    """Delete messages older than MESSAGE_RETENTION_DAYS in small batches.
+
+    An exclusive application lock makes VMs take turns; a VM that can't get
+    it skips this run.
+    """
+    conn = get_connection()
+    conn.autocommit = True  # each batch commits on its own
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SET NOCOUNT ON;
+            DECLARE @result INT;
+            EXEC @result = sp_getapplock @Resource = 'messages-retention', @LockMode = 'Exclusive',
+                @LockOwner = 'Session', @LockTimeout = 0;
+            SELECT @result;
+            SET NOCOUNT OFF; -- the DELETEs below rely on row counts
+        """)
+        if cursor.fetchone()[0] < 0:
+            return {'status': 'OK', 'purged': 0, 'note': 'another VM is purging'}
+        purged = 0
+        try:
+            while True:
+                cursor.execute(
+                    "DELETE TOP (?) FROM messages WHERE created_at < DATEADD(second, -?, GETDATE())",
+                    # DATEADD truncates fractional numbers, so pass whole seconds
+                    (RETENTION_BATCH_ROWS, int(MESSAGE_RETENTION_DAYS * 86400))
+                )
+                # rowcount is -1 when the server sends no count; treat it as done
+                deleted = max(cursor.rowcount, 0)
+                purged += deleted
+                RETENTION_PURGED.inc(deleted)
+                if deleted < RETENTION_BATCH_ROWS:
+                    break
+                time.sleep(RETENTION_PAUSE_MS / 1000)
+        finally:
+            cursor.execute("EXEC sp_releaseapplock @Resource = 'messages-retention', @LockOwner = 'Session'")
+    finally:
+        conn.close()
+    if purged:
+        MESSAGE_CACHE.invalidate()
+    return {'status': 'OK', 'purged': purged}
+
+PROBES = {
+    'nat': Probe('nat', get_outbound_ip, NAT_PROBE_INTERVAL),
+    'db': Probe('db', probe_database, DB_PROBE_INTERVAL),
+}
+if MESSAGE_RETENTION_DAYS > 0:
+    PROBES['retention'] = Probe('retention', purge_expired_messages, RETENTION_INTERVAL)
+
+_background_pid = None
+_background_lock = threading.Lock()
+
+def start_background_tasks():
+    """Start probe threads once per worker process (gunicorn forks workers)."""
+    global _background_pid
+    with _background_lock:
+        if _background_pid == os.getpid():
+            return
+        _background_pid = os.getpid()
+        for probe in PROBES.values():
+            threading.Thread(target=probe.loop, name=f'probe-{probe.name}', daemon=True).start()
+        if WRITE_BATCH_WINDOW_MS > 0:
+            threading.Thread(target=WRITE_BATCHER.loop, name='write-batcher', daemon=True).start()
+        if METRICS_DIR:
+            threading.Thread(target=save_worker_metrics_loop, name='metrics-saver', daemon=True).start()
+
+@app.before_request
+def ensure_background_tasks():
+    start_background_tasks()
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.sql_seconds = 0.0
+
+@app.after_request
+def record_request_time(response):
+    """Record total and SQL time per endpoint; the difference is rendering/app time.
+
+    Streamed responses (/export) are recorded once the body has been sent,
+    so the time spent fetching and writing rows is included.
+    """
+    if 'request_started' not in g:
+        return response
+    endpoint = request.endpoint or 'unknown'
+    request_g = g._get_current_object()
+    def observe():
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - request_g.request_started, endpoint=endpoint)
+        HTTP_SQL_SECONDS.observe(request_g.sql_seconds, endpoint=endpoint)
+    if response.is_streamed:
+        response.call_on_close(observe)
+    else:
+        observe()
+    return response
+
+def format_age(age):
+    """Describe how long ago a probe result was taken."""
+    return 'not checked yet' if age is None else f'checked {int(age)}s ago'
+
 @app.route('/')
 def index():
     """Display hostname, messages list, and add form."""
-    db_status = "Connected"
     messages = []
 
+    # Connectivity status comes from the background probes (no I/O here)
+    db_probe, db_age = PROBES['db'].snapshot()
+    outbound_ip, nat_age = PROBES['nat'].snapshot()
+    db_status = "Connected" if db_probe['status'] == 'OK' else db_probe['status']
+
+    # Conditional GET: a cheap, briefly cached version lookup lets an unchanged
+    # page skip the full query and render. Pages carrying a one-off
+    # error/success message are never cached.
+    cacheable = 'error' not in session and 'success' not in session
+    if cacheable and request.if_none_match:
+        try:
+            etag = page_etag(get_table_version(), db_probe, outbound_ip)
+        except Exception:
+            etag = None
+        if etag and request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+            response.set_etag(etag, weak=True)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+
     # Get any error/success messages from session
     error_msg = session.pop('error', None)
     success_msg = session.pop('success', None)
 
+    etag = None
     try:
-        conn = get_connection()
-        init_db()
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, message, hostname, created_at FROM messages ORDER BY created_at DESC")
-        messages = cursor.fetchall()
-        conn.close()
+        messages, version = list_messages()
+        if cacheable:
+            etag = page_etag(version, db_probe, outbound_ip)
     except Exception as e:
-        db_status = f"Error: {e}"
-
-    # Fetch outbound IP via NAT Gateway
-    outbound_ip = get_outbound_ip()
+        db_status = describe_db_error(e)
 
     # Build HTML response
     html = f"""<!DOCTYPE html>
@@ -189,11 +1137,13 @@ def index():
     <div class="status {'ok' if db_status == 'Connected' else 'error'}">
         <strong>Database:</strong> {db_status}
         {f'<br><small>{SQL_SERVER} / {SQL_DATABASE}</small>' if db_status == 'Connected' else ''}
+        <br><small>{format_age(db_age)}</small>
     </div>
 
     <div class="status {'ok' if outbound_ip['status'] == 'OK' else 'error'}">
         <strong>NAT Gateway (Outbound IP):</strong> {outbound_ip['status']}
         {f"<br><small>Public IP: {outbound_ip['ip']}</small>" if outbound_ip['status'] == 'OK' else ''}
+        <br><small>{format_age(nat_age)}</small>
     </div>
 
     {f'<div class="status error"><strong>Error:</strong> {error_msg}</div>' if error_msg else ''}
@@ -209,8 +1159,13 @@ def index():
     </form>
 
     <h2>Messages</h2>
+    <small>Export: <a href="/export?format=csv">CSV</a> | <a href="/export?format=ndjson">NDJSON</a></small>
+    <form id="bulk-delete" method="POST" action="/delete-selected" style="margin: 10px 0;">
+        <button type="submit" class="delete-btn">Delete selected</button>
+    </form>
     <table>
         <tr>
+            <th></th>
             <th>ID</th>
             <th>Message</th>
             <th>From Host</th>
@@ -222,6 +1177,7 @@ def index():
     if messages:
         for msg in messages:
             html += f"""        <tr>
+            <td><input type="checkbox" name="ids" value="{msg[0]}" form="bulk-delete"></td>
             <td>{msg[0]}</td>
             <td>{msg[1]}</td>
             <td>{msg[2]}</td>
@@ -234,14 +1190,19 @@ def index():
         </tr>
 """
     else:
-        html += """        <tr><td colspan="5">No messages yet. Add one above!</td></tr>
+        html += """        <tr><td colspan="6">No messages yet. Add one above!</td></tr>
 """
 
     html += """    </table>
 </body>
 </html>"""
 
-    return html
+    response = Response(html)
+    if etag:
+        response.set_etag(etag, weak=True)
+    # Browsers must revalidate, which is cheap thanks to the ETag
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 @app.route('/add', methods=['POST'])
 def add_message():
@@ -249,14 +1210,12 @@ def add_message():
     message = request.form.get('message', '').strip()
     if message:
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute(
-                "INSERT INTO messages (message, hostname) VALUES (?, ?)",
-                (message, HOSTNAME)
-            )
-            conn.commit()
-            conn.close()
+            if WRITE_BATCH_WINDOW_MS > 0:
+                WRITE_BATCHER.insert(message, HOSTNAME)
+            else:
+                insert_messages([(message, HOSTNAME)])
+            MESSAGE_CACHE.invalidate()
+            pin_to_primary()
         except Exception as e:
             session['error'] = f"Add message failed: {e}"
     return redirect(url_for('index'))
@@ -265,25 +1224,39 @@ def add_message():
 def delete_message(msg_id):
     """Delete a message by ID."""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM messages WHERE id = ?", (msg_id,))
-        conn.commit()
-        conn.close()
+        run_write(lambda cursor: cursor.execute("DELETE FROM messages WHERE id = ?", (msg_id,)))
+        MESSAGE_CACHE.invalidate(deleted_ids=[msg_id])
+        pin_to_primary()
     except Exception as e:
         session['error'] = f"Delete failed: {e}"
     return redirect(url_for('index'))
 
+@app.route('/delete-selected', methods=['POST'])
+def delete_selected():
+    """Delete all checked messages with one set-based statement."""
+    try:
+        ids = sorted({int(v) for v in request.form.getlist('ids')})
+    except ValueError:
+        session['error'] = "Delete failed: invalid message id"
+        return redirect(url_for('index'))
+    if ids:
+        try:
+            # One JSON parameter instead of one parameter per id (SQL Server allows 2100)
+            deleted = run_write(lambda cursor: cursor.execute(
+                "DELETE FROM messages WHERE id IN (SELECT CAST(value AS INT) FROM OPENJSON(?))",
+                (json.dumps(ids),)
+            ).rowcount)
+            MESSAGE_CACHE.invalidate(deleted_ids=ids)
+            pin_to_primary()
+            session['success'] = f"Deleted {deleted} messages"
+        except Exception as e:
+            session['error'] = f"Delete failed: {e}"
+    return redirect(url_for('index'))
+
 @app.route('/import-from-blob', methods=['POST'])
 def import_from_blob():
     """Import messages from blob storage CSV using SQL Server's outbound connection."""
-    try:
-        conn = get_connection()
-        cursor = conn.cursor()
-
-        # Ensure blob access is set up
-        init_blob_access()
-
+    def import_rows(cursor):
         # Read CSV from blob storage using OPENROWSET
         cursor.execute("""
             SELECT BulkColumn
@@ -306,12 +1279,100 @@ def import_from_blob():
                     (message, "Blob Import")
                 )
                 count += 1
-        conn.commit()
-        conn.close()
+        return count
+
+    try:
+        # Ensure blob access is set up
+        init_blob_access()
+        count = run_write(import_rows)
+        MESSAGE_CACHE.invalidate()
+        pin_to_primary()
         session['success'] = f"Imported {count} messages from blob storage"
     except Exception as e:
         session['error'] = f"Blob import failed: {e}"
     return redirect(url_for('index'))
 
+def parse_time_arg(name):
+    """Parse an optional ISO 8601 query argument; raises ValueError if malformed."""
+    value = request.args.get(name)
+    return datetime.datetime.fromisoformat(value) if value else None
+
+def export_rows(cursor, fmt):
+    """Yield the export body in EXPORT_BATCH_ROWS chunks so memory stays flat."""
+    columns = ['id', 'message', 'hostname', 'created_at']
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    if fmt == 'csv':
+        writer.writerow(columns)
+    while True:
+        rows = cursor.fetchmany(EXPORT_BATCH_ROWS)
+        if not rows:
+            break
+        for row in rows:
+            values = [row[0], row[1], row[2], row[3].isoformat() if row[3] else None]
+            if fmt == 'csv':
+                writer.writerow(values)
+            else:
+                buf.write(json.dumps(dict(zip(columns, values))) + '\n')
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.getvalue():
+        yield buf.getvalue()
+
+@app.route('/export')
+def export_messages():
+    """Stream messages as CSV or NDJSON, optionally filtered by time range and hostname."""
+    fmt = request.args.get('format', 'csv')
+    if fmt not in ('csv', 'ndjson'):
+        return Response("format must be csv or ndjson\n", status=400, mimetype='text/plain')
+    try:
+        since, until = parse_time_arg('since'), parse_time_arg('until')
+    except ValueError:
+        return Response("since/until must be ISO 8601 timestamps\n", status=400, mimetype='text/plain')
+
+    sql = "SELECT id, message, hostname, created_at FROM messages WHERE 1 = 1"
+    params = []
+    if since:
+        sql += " AND created_at >= ?"
+        params.append(since)
+    if until:
+        sql += " AND created_at < ?"
+        params.append(until)
+    if request.args.get('hostname'):
+        sql += " AND hostname = ?"
+        params.append(request.args['hostname'])
+    # Clustered key order streams straight off the index without a sort
+    sql += " ORDER BY id"
+
+    def query(conn):
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        return cursor
+    try:
+        conn, cursor = run_read(query, keep_open=True)
+    except Exception as e:
+        return Response(f"Export failed: {describe_db_error(e)}\n", status=503, mimetype='text/plain')
+
+    def generate():
+        try:
+            yield from export_rows(cursor, fmt)
+        finally:
+            conn.close()
+
+    response = Response(
+        stream_with_context(generate()),
+        mimetype='text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename=messages.{fmt}'
+    return response
+
+@app.route('/metrics')
+def metrics():
+    """Expose app metrics in the Prometheus text format."""
+    totals = collect_metrics()
+    body = '\n'.join(metric.render(totals[metric.name]) for metric in METRICS) + '\n'
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=80)
@@ -0,0 +1,140 @@
+"""
+Load benchmark for app.py against the SQLite stand-in database.
+
+Drives the app in-process through Flask's test client, so no server, network
+or Azure resources are needed. For each scenario it reports throughput,
+latency percentiles and SQL connections opened per request.
+
+    python3 bench.py --rows 5000 --concurrency 8 --requests 400
+    python3 bench.py --scenarios index,add --query-ms 2 --connect-ms 20
+
+Simulated latency flags set STANDIN_* variables, so run each configuration
+as its own process.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+SCENARIOS = ['index', 'revalidate', 'add', 'delete', 'import']
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f'comma-separated subset of {",".join(SCENARIOS)}')
+    parser.add_argument('--rows', type=int, default=1000, help='messages to seed before each run')
+    parser.add_argument('--concurrency', type=int, default=4, help='concurrent client threads')
+    parser.add_argument('--requests', type=int, default=200, help='requests per scenario')
+    parser.add_argument('--connect-ms', type=float, default=0, help='simulated latency per connect')
+    parser.add_argument('--query-ms', type=float, default=0, help='simulated latency per statement')
+    parser.add_argument('--fault-rate', type=float, default=0,
+                        help='fraction of connects/statements failing with a transient error')
+    return parser.parse_args()
+
+def setup_environment(args):
+    """Point the app at a fresh stand-in database before it is imported."""
+    os.environ['STANDIN_DB_DIR'] = tempfile.mkdtemp(prefix='standin-bench-')
+    os.environ['STANDIN_CONNECT_MS'] = str(args.connect_ms)
+    os.environ['STANDIN_QUERY_MS'] = str(args.query_ms)
+    os.environ.setdefault('SQL_DATABASE', 'benchdb')
+    os.environ.setdefault('BLOB_STORAGE_URL', 'https://localhost/mock-container')
+    os.environ.setdefault('BLOB_STORAGE_ACCOUNT', 'mockstorageaccount')
+    # Keep background probes from opening connections during measurement
+    os.environ['DB_PROBE_INTERVAL'] = '3600'
+    os.environ['NAT_PROBE_INTERVAL'] = '3600'
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import standin_db
+    sys.modules['pyodbc'] = standin_db
+
+def seed(app_module, rows):
+    app_module.init_db()
+    conn = app_module.get_connection()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM messages")
+    for start in range(0, rows, 500):
+        batch = [(f'seed message {i}', 'bench-seed') for i in range(start, min(rows, start + 500))]
+        values = ', '.join(['(?, ?)'] * len(batch))
+        cursor.execute(f"INSERT INTO messages (message, hostname) VALUES {values}",
+                       [v for row in batch for v in row])
+    conn.commit()
+    cursor.execute("SELECT id FROM messages")
+    ids = [row[0] for row in cursor.fetchall()]
+    conn.close()
+    return ids
+
+def make_request(client, scenario, n, ids):
+    if scenario == 'index':
+        return client.get('/')
+    if scenario == 'revalidate':
+        # Conditional GET with the ETag of the previous view, as a browser reload sends
+        response = client.get('/', headers={'If-None-Match': getattr(client, 'etag', '')})
+        client.etag = response.headers.get('ETag', getattr(client, 'etag', ''))
+        return response
+    if scenario == 'add':
+        return client.post('/add', data={'message': f'bench message {n}'})
+    if scenario == 'delete':
+        return client.post(f'/delete/{ids[n % len(ids)]}')
+    return client.post('/import-from-blob')
+
+def run_scenario(app_module, standin_db, scenario, args, ids):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    counter = iter(range(args.requests))
+
+    def worker():
+        client = app_module.app.test_client()
+        while True:
+            with lock:
+                n = next(counter, None)
+            if n is None:
+                return
+            start = time.perf_counter()
+            response = make_request(client, scenario, n, ids)
+            elapsed = time.perf_counter() - start
+            with client.session_transaction() as sess:
+                failed = response.status_code >= 400 or sess.pop('error', None) is not None
+            with lock:
+                latencies.append(elapsed)
+                errors[0] += failed
+
+    standin_db.reset_stats()
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(args.concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+    connects = standin_db.stats['connects']
+
+    latencies.sort()
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] * 1000
+    print(f"{scenario:<10} {len(latencies) / wall:>9.1f} {pct(50):>8.2f} {pct(95):>8.2f} {pct(99):>8.2f} "
+          f"{latencies[-1] * 1000:>8.2f} {connects / len(latencies):>9.2f} {errors[0]:>6}")
+
+def main():
+    args = parse_args()
+    setup_environment(args)
+    import standin_db
+    import app as app_module
+
+    # Start background tasks and let the first probes finish before measuring
+    app_module.app.test_client().get('/')
+    time.sleep(0.5)
+
+    print(f"rows={args.rows} concurrency={args.concurrency} requests={args.requests} "
+          f"connect_ms={args.connect_ms} query_ms={args.query_ms} fault_rate={args.fault_rate}")
+    print(f"{'scenario':<10} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'max ms':>8} {'conn/req':>9} {'errors':>6}")
+    for scenario in args.scenarios.split(','):
+        standin_db.FAULT_RATE = 0
+        ids = seed(app_module, args.rows)
+        standin_db.FAULT_RATE = args.fault_rate
+        run_scenario(app_module, standin_db, scenario, args, ids)
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,5 @@
 #!/bin/bash
-# Run the Flask app locally for testing (without a real database)
+# Run the Flask app locally for testing against a SQLite stand-in database
 
 cd "$(dirname "$0")"
 
@@ -25,16 +25,16 @@ echo "Starting Flask app on http://localhost:8080"
 echo "Press Ctrl+C to stop"
 echo ""
 
-# Run with a mock pyodbc module so the app loads without the real driver
+# Stand-in database files live here; delete the directory to start fresh
+export STANDIN_DB_DIR="${STANDIN_DB_DIR:-$(pwd)/.standin-db}"
+mkdir -p "$STANDIN_DB_DIR"
+
+# Run with the SQLite-backed stand-in for pyodbc so the app works without the real driver
 python3 -c "
 import sys
+import standin_db
 
-# Create a mock pyodbc module
-class MockPyodbc:
-    def connect(self, *args, **kwargs):
-        raise Exception('Mock mode - no database connection')
-
-sys.modules['pyodbc'] = MockPyodbc()
+sys.modules['pyodbc'] = standin_db
 
 import app
 app.app.run(host='0.0.0.0', port=8080, debug=True)
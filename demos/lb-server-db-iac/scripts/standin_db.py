@@ -0,0 +1,326 @@
+"""
+SQLite-backed stand-in for pyodbc, for running app.py without Azure SQL.
+
+Install it before importing the app:
+
+    import sys, standin_db
+    sys.modules['pyodbc'] = standin_db
+
+Each `Database=` in the connection string maps to its own SQLite file in
+STANDIN_DB_DIR, and connections with `ApplicationIntent=ReadOnly` get a
+read-only replica of that file. The T-SQL the app sends is translated to SQLite:
+rowversion and change tracking are emulated with triggers, blob
+OPENROWSET reads files from STANDIN_BLOB_DIR, and security/DDL statements
+that have no SQLite meaning are accepted as no-ops.
+
+Environment:
+    STANDIN_DB_DIR          directory for the SQLite files (default: system temp dir)
+    STANDIN_BLOB_DIR        directory OPENROWSET(BULK ...) reads from (default: this directory)
+    STANDIN_CONNECT_MS      simulated latency per connect (default 0)
+    STANDIN_QUERY_MS        simulated latency per execute (default 0)
+    STANDIN_FAULT_RATE      fraction of connects/executes failing with a transient error (default 0)
+    STANDIN_FAULT_CODE      SQL Server error number of injected faults (default 40613)
+    STANDIN_REPLICA_LAG_MS  how far read-only replicas trail the primary (default 0)
+"""
+import datetime
+import os
+import random
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+
+DB_DIR = os.environ.get('STANDIN_DB_DIR', tempfile.gettempdir())
+BLOB_DIR = os.environ.get('STANDIN_BLOB_DIR', os.path.dirname(os.path.abspath(__file__)))
+CONNECT_MS = float(os.environ.get('STANDIN_CONNECT_MS', '0'))
+QUERY_MS = float(os.environ.get('STANDIN_QUERY_MS', '0'))
+FAULT_RATE = float(os.environ.get('STANDIN_FAULT_RATE', '0'))
+FAULT_CODE = int(os.environ.get('STANDIN_FAULT_CODE', '40613'))
+REPLICA_LAG_MS = float(os.environ.get('STANDIN_REPLICA_LAG_MS', '0'))
+
+# DB-API module attributes (mirroring pyodbc)
+apilevel = '2.0'
+threadsafety = 1
+paramstyle = 'qmark'
+pooling = True
+
+class Error(Exception):
+    pass
+
+class DatabaseError(Error):
+    pass
+
+class DataError(DatabaseError):
+    pass
+
+class OperationalError(DatabaseError):
+    pass
+
+class IntegrityError(DatabaseError):
+    pass
+
+class ProgrammingError(DatabaseError):
+    pass
+
+# Counters for benchmarks: connections opened, statements executed, faults injected
+stats = {'connects': 0, 'executes': 0, 'faults': 0}
+_stats_lock = threading.Lock()
+
+def _count(key):
+    with _stats_lock:
+        stats[key] += 1
+
+def reset_stats():
+    with _stats_lock:
+        for key in stats:
+            stats[key] = 0
+
+def _maybe_fail():
+    """Raise an Azure SQL-style transient error for a FAULT_RATE fraction of calls."""
+    if FAULT_RATE and random.random() < FAULT_RATE:
+        _count('faults')
+        raise OperationalError(
+            'HY000', f'[HY000] [Stand-in] Database is not currently available. Please retry later. ({FAULT_CODE})'
+        )
+
+sqlite3.register_adapter(datetime.datetime, lambda d: d.isoformat(' ', 'milliseconds'))
+sqlite3.register_converter('TIMESTAMP', lambda b: datetime.datetime.fromisoformat(b.decode()))
+
+NOW_SQL = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    message TEXT NOT NULL CHECK (length(message) <= 500),
+    hostname TEXT NOT NULL CHECK (length(hostname) <= 100),
+    created_at TIMESTAMP DEFAULT ({NOW_SQL}),
+    rv INTEGER
+);
+CREATE INDEX IF NOT EXISTS messages_rv ON messages (rv);
+CREATE TABLE IF NOT EXISTS _db_version (value INTEGER NOT NULL);
+INSERT INTO _db_version SELECT 0 WHERE NOT EXISTS (SELECT * FROM _db_version);
+CREATE TABLE IF NOT EXISTS _ct_messages (
+    id INTEGER PRIMARY KEY, SYS_CHANGE_OPERATION TEXT NOT NULL, version INTEGER NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS messages_ins AFTER INSERT ON messages BEGIN
+    UPDATE _db_version SET value = value + 1;
+    UPDATE messages SET rv = (SELECT value FROM _db_version) WHERE id = NEW.id;
+    INSERT OR REPLACE INTO _ct_messages VALUES (NEW.id, 'I', (SELECT value FROM _db_version));
+END;
+CREATE TRIGGER IF NOT EXISTS messages_del AFTER DELETE ON messages BEGIN
+    UPDATE _db_version SET value = value + 1;
+    INSERT OR REPLACE INTO _ct_messages VALUES (OLD.id, 'D', (SELECT value FROM _db_version));
+END;
+CREATE TABLE IF NOT EXISTS _external_data_sources (name TEXT PRIMARY KEY, location TEXT);
+"""
+
+# Statements with no SQLite equivalent that the stand-in accepts and ignores
+NOOP_STATEMENTS = [
+    r'CREATE MASTER KEY',
+    r'DATABASE SCOPED CREDENTIAL',
+    r'SET CHANGE_TRACKING',
+    r'ENABLE CHANGE_TRACKING',
+    r'IF COL_LENGTH\(',
+    r'sp_releaseapplock',
+]
+
+# (pattern, replacement) rewrites applied to everything else
+REWRITES = [
+    # Writers are serialized, so nothing is in flight below the next version
+    (r'(CAST\()?MIN_ACTIVE_ROWVERSION\(\)( AS BIGINT\))?', '((SELECT value FROM _db_version) + 1)'),
+    (r'CAST\((\w+) AS BIGINT\)', r'\1'),
+    (r'CAST\(\? AS BINARY\(8\)\)', '?'),
+    (r"IF NOT EXISTS \(SELECT \* FROM sys\.indexes WHERE name = '\w+'\) CREATE INDEX",
+     'CREATE INDEX IF NOT EXISTS'),
+    (r'DATEADD\(second, -\?, GETDATE\(\)\)', f"{NOW_SQL[:-1]}, '-' || CAST(? AS INTEGER) || ' seconds')"),
+    (r'OPENJSON\(\?\)', 'json_each(?)'),
+    (r'CHANGETABLE\(CHANGES messages, \?\)',
+     '(SELECT id, SYS_CHANGE_OPERATION FROM _ct_messages WHERE version > ?)'),
+    (r'CHANGE_TRACKING_CURRENT_VERSION\(\)', '(SELECT value FROM _db_version)'),
+    (r"CHANGE_TRACKING_MIN_VALID_VERSION\(OBJECT_ID\('\w+'\)\)", '0'),
+    (r'GETDATE\(\)', NOW_SQL),
+    (r'COUNT_BIG\(', 'COUNT('),
+    (r'sys\.external_data_sources', '_external_data_sources'),
+]
+
+def translate(sql):
+    """Return SQLite SQL for a T-SQL statement, or None if it is a no-op."""
+    sql = ' '.join(sql.split())
+    if any(re.search(p, sql) for p in NOOP_STATEMENTS):
+        return None
+    for pattern, replacement in REWRITES:
+        sql = re.sub(pattern, replacement, sql)
+    return sql
+
+class Cursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self._cursor = connection._conn.cursor()
+        self._rows = None  # rows produced by the stand-in itself
+        self.rowcount = -1
+
+    @property
+    def description(self):
+        return None if self._rows is not None else self._cursor.description
+
+    def execute(self, sql, *params):
+        if len(params) == 1 and isinstance(params[0], (list, tuple)):
+            params = params[0]
+        _count('executes')
+        if QUERY_MS:
+            time.sleep(QUERY_MS / 1000)
+        _maybe_fail()
+        self._rows = None
+        self.rowcount = -1
+        try:
+            m = re.findall(r'SET NOCOUNT (ON|OFF)', sql, re.IGNORECASE)
+            if m:
+                # Like SQL Server, the setting lasts for the rest of the session
+                self.connection.nocount = m[-1].upper() == 'ON'
+            handled = self._execute_special(' '.join(sql.split()), params)
+            if not handled:
+                translated = translate(sql)
+                if translated is None:
+                    self._rows = []
+                else:
+                    self._cursor.execute(translated, params)
+                    self.rowcount = self._cursor.rowcount
+        except sqlite3.IntegrityError as e:
+            raise DataError('22001', f'[22001] String or binary data would be truncated ({e})') from e
+        except sqlite3.OperationalError as e:
+            raise ProgrammingError('42000', f'[42000] {e} (translated from: {sql.strip()[:200]})') from e
+        if self.connection.nocount:
+            self.rowcount = -1
+        return self
+
+    def _execute_special(self, sql, params):
+        """Handle statements that need more than a textual rewrite."""
+        if re.match(r"IF NOT EXISTS \(SELECT \* FROM sysobjects WHERE name='messages'", sql):
+            self.connection._conn.executescript(SCHEMA)
+            self._rows = []
+            return True
+        m = re.match(r"CREATE EXTERNAL DATA SOURCE (\w+) WITH \(.*LOCATION = '([^']*)'", sql)
+        if m:
+            self._cursor.execute("INSERT OR REPLACE INTO _external_data_sources VALUES (?, ?)", m.groups())
+            return True
+        if 'sp_getapplock' in sql:
+            # Single process per database file, so the lock is always granted
+            self._rows = [(0,)]
+            return True
+        m = re.match(r'DELETE TOP \(\?\) FROM (\w+) WHERE (.*)', sql)
+        if m:
+            # SQLite has no DELETE TOP; the limit parameter moves to the end
+            table, where = m.groups()
+            self._cursor.execute(
+                f"DELETE FROM {table} WHERE rowid IN (SELECT rowid FROM {table} WHERE {translate(where)} LIMIT ?)",
+                list(params[1:]) + [params[0]]
+            )
+            self.rowcount = self._cursor.rowcount
+            return True
+        m = re.match(r'DROP EXTERNAL DATA SOURCE (\w+)', sql)
+        if m:
+            self._cursor.execute("DELETE FROM _external_data_sources WHERE name = ?", m.groups())
+            return True
+        m = re.search(r"OPENROWSET\( ?BULK '([^']+)'", sql)
+        if m:
+            with open(os.path.join(BLOB_DIR, m.group(1))) as f:
+                self._rows = [(f.read(),)]
+            return True
+        return False
+
+    def fetchone(self):
+        if self._rows is not None:
+            return self._rows.pop(0) if self._rows else None
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size=1):
+        if self._rows is not None:
+            rows, self._rows = self._rows[:size], self._rows[size:]
+            return rows
+        return self._cursor.fetchmany(size)
+
+    def fetchall(self):
+        if self._rows is not None:
+            rows, self._rows = self._rows, []
+            return rows
+        return self._cursor.fetchall()
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def close(self):
+        self._cursor.close()
+
+class Connection:
+    def __init__(self, path, readonly=False):
+        self._conn = sqlite3.connect(
+            f'file:{path}?mode=ro' if readonly else path, uri=readonly,
+            timeout=30, check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES
+        )
+        if not readonly:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+        self.nocount = False
+
+    @property
+    def autocommit(self):
+        return self._conn.isolation_level is None
+
+    @autocommit.setter
+    def autocommit(self, value):
+        self._conn.isolation_level = None if value else ''
+
+    def cursor(self):
+        return Cursor(self)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        # Like pyodbc, discard uncommitted work so the write lock is released
+        # even if a failed cursor is still referenced by a traceback
+        self._conn.rollback()
+        self._conn.close()
+
+def database_path(conn_str):
+    """Map the connection string's Database= to a SQLite file."""
+    m = re.search(r'Database=([^;]*)', conn_str, re.IGNORECASE)
+    name = re.sub(r'\W', '_', m.group(1)) if m and m.group(1) else 'standin'
+    return os.path.join(DB_DIR, f'{name}.sqlite')
+
+# Replica file -> time.monotonic() of its last copy from the primary
+_replica_synced_at = {}
+_replica_lock = threading.Lock()
+
+def replica_path(primary_path):
+    """Return a copy of primary_path that is at most REPLICA_LAG_MS behind it."""
+    if not REPLICA_LAG_MS:
+        return primary_path
+    path = primary_path[:-len('.sqlite')] + '.replica.sqlite'
+    with _replica_lock:
+        if time.monotonic() - _replica_synced_at.get(path, float('-inf')) >= REPLICA_LAG_MS / 1000:
+            source = sqlite3.connect(primary_path, timeout=30)
+            target = sqlite3.connect(path, timeout=30)
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+                source.close()
+            _replica_synced_at[path] = time.monotonic()
+    return path
+
+def connect(conn_str, **kwargs):
+    _count('connects')
+    if CONNECT_MS:
+        time.sleep(CONNECT_MS / 1000)
+    _maybe_fail()
+    try:
+        path = database_path(conn_str)
+        if re.search(r'ApplicationIntent=ReadOnly', conn_str, re.IGNORECASE):
+            return Connection(replica_path(path), readonly=True)
+        return Connection(path)
+    except sqlite3.Error as e:
+        raise OperationalError('08001', f'[08001] {e}') from e
@@ -17,6 +17,16 @@ echo "deb [arch=amd64,arm64 signed-by=/usr/share/keyrings/microsoft-prod.gpg] ht
 apt-get update
 ACCEPT_EULA=Y apt-get install -y msodbcsql18 unixodbc-dev
 
+# unixODBC only pools connections when asked to. With pooling on, pyodbc reuses
+# connections per connection string (primary and read replica each get a pool)
+# instead of a new TLS handshake per query.
+if ! grep -q '^Pooling *= *Yes' /etc/odbcinst.ini; then
+  printf '\n[ODBC]\nPooling=Yes\n' >> /etc/odbcinst.ini
+fi
+if ! grep -q '^CPTimeout' /etc/odbcinst.ini; then
+  sed -i '/^\[ODBC Driver 18 for SQL Server\]/a CPTimeout=120' /etc/odbcinst.ini
+fi
+
 # Create application directory
 mkdir -p /opt/demo-app
 
@@ -46,8 +56,16 @@ export SQL_PASSWORD=$(echo "$USER_DATA" | jq -r '.sqlPassword')
 export BLOB_STORAGE_URL=$(echo "$USER_DATA" | jq -r '.blobStorageUrl')
 export BLOB_STORAGE_ACCOUNT=$(echo "$USER_DATA" | jq -r '.blobStorageAccount')
 
-# Start gunicorn with the Flask app
+# Workers save their metrics here so /metrics can sum them; start each run
+# with an empty directory so counters only cover this run
+export METRICS_DIR=/run/demo-app-metrics
+rm -rf "$METRICS_DIR"
+mkdir -p "$METRICS_DIR"
+
+# Start gunicorn with the Flask app. Threads let a worker serve requests
+# concurrently, which group commit (WRITE_BATCH_WINDOW_MS) depends on.
 exec /opt/demo-app/venv/bin/gunicorn --bind 0.0.0.0:80 --workers 2 \
+  --threads "${GUNICORN_THREADS:-8}" \
   --access-logfile /var/log/demo-app-access.log \
   --error-logfile /var/log/demo-app-error.log \
   app:app